@@ -63,6 +63,16 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR.parent / 'frontend']
 
+# Task graph, score and strategy caches must be shared by every worker process.
+# The file cache covers all workers on one host; use Redis or Memcached when running several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -70,3 +80,21 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
 }
+
+# TaskAnalysis history: 'changes' keeps one row per strategy change, 'all' one per request, 'none' disables it
+TASK_ANALYSIS_HISTORY = 'changes'
+TASK_ANALYSIS_RETENTION_DAYS = 90
+TASK_ANALYSIS_KEEP_PER_WORKSPACE = 50
+
+# Analyze admission control; see tasks/admission.py for all keys and defaults
+TASK_ADMISSION = {
+    'SMALL_LANE_CONCURRENCY': 8,
+    'LARGE_LANE_CONCURRENCY': 1,
+    'MEMORY_BUDGET_BYTES': 512 * 1024 * 1024,
+}
+
+# Memory-mapped per-workspace task snapshots shared by all workers; set to None to read the ORM directly
+TASK_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+# Seconds to wait after a task write before rebuilding its snapshot, coalescing bursts of writes
+# into one rebuild; 0 rebuilds as each write commits, so writers read their own writes
+TASK_SNAPSHOT_REBUILD_DELAY = 0
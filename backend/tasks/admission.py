@@ -0,0 +1,207 @@
+"""Admission control for analyze requests.
+
+Requests are sized from their declared ``X-Task-Count`` header and
+``Content-Length`` before the body is parsed. Small and large analyses run in
+separate bounded lanes so a few huge payloads cannot starve small requests,
+and every admitted request reserves an estimate of its peak memory against a
+shared budget.
+
+All lane and memory state lives in the worker process. The limits therefore
+only take effect with threaded workers (e.g. gunicorn ``--worker-class
+gthread``), where one process serves many requests at once. A sync worker
+handles one request at a time and never fills a lane. With N worker processes,
+every limit, including the memory budget, applies N times over. Size
+TASK_ADMISSION per process accordingly.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'SMALL_LANE_CONCURRENCY': 8,
+    'LARGE_LANE_CONCURRENCY': 1,
+    # How long a request may queue for a lane slot before being turned away
+    'SMALL_QUEUE_TIMEOUT': 0.5,
+    'LARGE_QUEUE_TIMEOUT': 0.0,
+    'LARGE_TASK_THRESHOLD': 5000,
+    'LARGE_BYTES_THRESHOLD': 1024 * 1024,
+    'MEMORY_BUDGET_BYTES': 512 * 1024 * 1024,
+    # Parsed tasks, scores and the rendered response take roughly this many bytes per request byte
+    'MEMORY_PER_REQUEST_BYTE': 10,
+    # Estimates the task count from Content-Length when X-Task-Count is missing or implausibly low
+    'AVERAGE_TASK_BYTES': 150,
+    'SMALL_RETRY_AFTER': 1,
+    'LARGE_RETRY_AFTER': 10,
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class Lane:
+    """A bounded concurrency lane with a short wait queue and wait-time metrics."""
+
+    def __init__(self, name, concurrency, queue_timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_timeout = queue_timeout
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self):
+        started = time.monotonic()
+        with self.condition:
+            if self.active >= self.concurrency:
+                if self.queue_timeout <= 0:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+                try:
+                    admitted = self.condition.wait_for(lambda: self.active < self.concurrency, self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.rejected += 1
+                    return False
+            waited = time.monotonic() - started
+            self.active += 1
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                'concurrency': self.concurrency,
+                'active': self.active,
+                'queue_depth': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_wait_seconds': self.total_wait / self.admitted if self.admitted else 0.0,
+                'max_wait_seconds': self.max_wait,
+            }
+
+
+class AdmissionController:
+    def __init__(self, config):
+        self.config = config
+        self.lanes = {
+            'small': Lane('small', config['SMALL_LANE_CONCURRENCY'], config['SMALL_QUEUE_TIMEOUT']),
+            'large': Lane('large', config['LARGE_LANE_CONCURRENCY'], config['LARGE_QUEUE_TIMEOUT']),
+        }
+        self.lock = threading.Lock()
+        self.memory_reserved = 0
+        self.memory_rejected = 0
+
+    def estimate(self, task_count, byte_size):
+        """Return (lane name, estimated task count, estimated memory bytes) for a declared request size."""
+        config = self.config
+        if byte_size is not None:
+            # Never trust a declared count below what the body size implies
+            implied_count = byte_size // config['AVERAGE_TASK_BYTES']
+            task_count = implied_count if task_count is None else max(task_count, implied_count)
+        # A request of unknown size could be anything, so it goes to the large lane
+        if task_count is None or byte_size is None:
+            lane = 'large'
+        elif task_count >= config['LARGE_TASK_THRESHOLD'] or byte_size >= config['LARGE_BYTES_THRESHOLD']:
+            lane = 'large'
+        else:
+            lane = 'small'
+        memory = (byte_size or config['LARGE_BYTES_THRESHOLD']) * config['MEMORY_PER_REQUEST_BYTE']
+        return lane, task_count, memory
+
+    @contextmanager
+    def admit(self, task_count, byte_size):
+        """Hold a lane slot and a memory reservation for the duration of the block."""
+        lane_name, _, memory = self.estimate(task_count, byte_size)
+        retry_after = self.config['LARGE_RETRY_AFTER' if lane_name == 'large' else 'SMALL_RETRY_AFTER']
+        budget = self.config['MEMORY_BUDGET_BYTES']
+        if memory > budget:
+            with self.lock:
+                self.memory_rejected += 1
+            raise AdmissionRejected(413, 'Request is larger than the analysis memory budget.')
+
+        lane = self.lanes[lane_name]
+        if not lane.acquire():
+            raise AdmissionRejected(429, f'Too many {lane_name} analyses in progress.', retry_after)
+        try:
+            with self.lock:
+                if self.memory_reserved + memory > budget:
+                    self.memory_rejected += 1
+                    raise AdmissionRejected(503, 'Analysis memory budget exhausted.', retry_after)
+                self.memory_reserved += memory
+            try:
+                yield lane_name
+            finally:
+                with self.lock:
+                    self.memory_reserved -= memory
+        finally:
+            lane.release()
+
+    def snapshot(self):
+        with self.lock:
+            memory = {
+                'budget_bytes': self.config['MEMORY_BUDGET_BYTES'],
+                'reserved_bytes': self.memory_reserved,
+                'rejected': self.memory_rejected,
+            }
+        return {
+            'lanes': {name: lane.snapshot() for name, lane in self.lanes.items()},
+            'memory': memory,
+        }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """Return the process-wide controller, rebuilding it if TASK_ADMISSION changed."""
+    global _controller
+    config = dict(DEFAULTS, **getattr(settings, 'TASK_ADMISSION', {}))
+    with _controller_lock:
+        if _controller is None or _controller.config != config:
+            _controller = AdmissionController(config)
+        return _controller
+
+
+def reset_controller():
+    """Discard the process-wide controller and its metrics."""
+    global _controller
+    with _controller_lock:
+        _controller = None
+
+
+def declared_size(request):
+    """Read (task count, byte size) from request headers; either may be None if not declared.
+
+    Raises ValueError for malformed values.
+    """
+    task_count = request.META.get('HTTP_X_TASK_COUNT')
+    byte_size = request.META.get('CONTENT_LENGTH')
+    task_count = int(task_count) if task_count else None
+    byte_size = int(byte_size) if byte_size else None
+    if (task_count is not None and task_count < 0) or (byte_size is not None and byte_size < 0):
+        raise ValueError('Negative request size')
+    return task_count, byte_size
@@ -0,0 +1,300 @@
+"""Offline batch scoring over JSONL/CSV task exports.
+
+This module only depends on the pure scoring functions, so it can run
+without Django setup:
+
+    python -m tasks.batch backlog.jsonl scored.jsonl --strategy "High Impact" --top 100
+
+The same entry point backs ``manage.py score_tasks``.
+"""
+import argparse
+import csv
+import heapq
+import json
+import math
+import mmap
+import os
+import sys
+import tempfile
+from datetime import date
+from multiprocessing import Pool
+from typing import Any, Dict, Iterator, List, Optional
+
+from .scoring import build_dependency_graph, compute_scores, ranking_key
+
+
+DEFAULT_CHUNK_SIZE = 10000
+# Inputs at least this large are memory-mapped instead of read through buffered IO
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+OUTPUT_FIELDS = [
+    'id', 'title', 'due_date', 'estimated_hours', 'importance',
+    'dependencies', 'score', 'priority', 'explanation', 'in_cycle'
+]
+
+
+def detect_format(path: str) -> str:
+    """Guess 'jsonl' or 'csv' from a file extension."""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _iter_lines(path: str) -> Iterator[str]:
+    with open(path, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        # Empty files cannot be mapped
+        if size and size >= MMAP_THRESHOLD:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for line in iter(mapped.readline, b''):
+                    yield line.decode('utf-8')
+        else:
+            for line in handle:
+                yield line.decode('utf-8')
+
+
+class BatchInputError(ValueError):
+    """An input row that cannot be turned into a task; carries its line number."""
+
+    def __init__(self, line_number, message):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def _optional_number(value, cast):
+    """Coerce numbers and numeric strings; blanks, garbage and non-finite values become None like the API's defaults."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+    try:
+        number = float(value)
+        # inf and nan cannot be scored or written back out as JSON
+        return cast(number) if math.isfinite(number) else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _normalize_task(row: Any) -> Dict[str, Any]:
+    """Coerce a raw JSONL object or CSV row into the types compute_scores expects.
+
+    Raises ValueError for rows that are not objects or have unusable dependencies.
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {type(row).__name__}")
+
+    dependencies = row.get('dependencies')
+    if dependencies is None:
+        dependencies = []
+    elif isinstance(dependencies, str):
+        raw_dependencies = dependencies.strip()
+        if raw_dependencies.startswith('['):
+            try:
+                dependencies = json.loads(raw_dependencies)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"invalid dependencies: {exc}")
+        else:
+            dependencies = [dep.strip() for dep in raw_dependencies.split(';') if dep.strip()]
+    if not isinstance(dependencies, list):
+        raise ValueError(f"dependencies must be a list, got {type(dependencies).__name__}")
+
+    due_date = row.get('due_date')
+    return {
+        'id': str(row.get('id') or ''),
+        'title': str(row.get('title') or ''),
+        'due_date': str(due_date) if due_date else None,
+        'estimated_hours': _optional_number(row.get('estimated_hours'), float),
+        'importance': _optional_number(row.get('importance'), int),
+        'dependencies': [str(dep) for dep in dependencies if dep is not None]
+    }
+
+
+def iter_tasks(path: str, fmt: Optional[str] = None, skipped: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream normalized task dicts from a JSONL or CSV file.
+
+    CSV dependencies may be a JSON list or ';'-separated ids. A malformed row
+    raises BatchInputError with its line number, unless a ``skipped`` list is
+    given, in which case the error is appended to it and the row dropped.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        reader = csv.DictReader(_iter_lines(path))
+        rows = ((reader.line_num, row) for row in reader)
+    elif fmt == 'jsonl':
+        rows = _iter_json_rows(path)
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+    for line_number, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            yield _normalize_task(row)
+        except ValueError as exc:
+            error = BatchInputError(line_number, str(exc))
+            if skipped is None:
+                raise error
+            skipped.append(str(error))
+
+
+def _iter_json_rows(path: str) -> Iterator[tuple]:
+    for line_number, line in enumerate(_iter_lines(path), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, ValueError(f"invalid JSON: {exc}")
+
+
+def _iter_chunks(tasks: Iterator[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Per-process state for worker pools; set once by _init_worker instead of pickling the graph per chunk
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(graph: Dict[str, Any], strategy: str) -> None:
+    _worker_state['graph'] = graph
+    _worker_state['strategy'] = strategy
+
+
+def _score_chunk(chunk: List[Dict]) -> List[Dict]:
+    return compute_scores(chunk, _worker_state['strategy'], graph=_worker_state['graph'])
+
+
+def _to_record(task: Dict) -> Dict:
+    record = {field: task[field] for field in OUTPUT_FIELDS}
+    if isinstance(record['due_date'], date):
+        record['due_date'] = record['due_date'].isoformat()
+    return record
+
+
+class _Writer:
+    def __init__(self, handle, fmt: str):
+        self.handle = handle
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv_writer = csv.DictWriter(handle, fieldnames=OUTPUT_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write_chunk(self, scored_tasks: List[Dict]) -> None:
+        records = [_to_record(task) for task in scored_tasks]
+        if self.fmt == 'csv':
+            for record in records:
+                record['dependencies'] = ';'.join(record['dependencies'])
+            self.csv_writer.writerows(records)
+        else:
+            self.handle.write(''.join(json.dumps(record) + '\n' for record in records))
+
+
+def score_file(input_path: str, output_path: str, strategy: str = "Smart Balance",
+               top: Optional[int] = None, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               input_format: Optional[str] = None, output_format: Optional[str] = None,
+               skipped: Optional[List[str]] = None) -> int:
+    """Score every task in ``input_path`` and write the results to ``output_path``.
+
+    Pass one streams the file to collect ids and dependencies only, so cycle
+    detection and blocker counts cover the whole backlog. Pass two streams it
+    again and scores chunks against that graph. Without ``top`` rows are
+    written chunk by chunk, ranked within each chunk; with ``top`` only the
+    global top-K is written, fully ranked. Returns the number of tasks scored.
+
+    Bad rows raise BatchInputError, or are reported in ``skipped`` when a list
+    is passed. Output goes to a temporary file that only replaces
+    ``output_path`` once every row has been scored.
+    """
+    output_format = output_format or detect_format(output_path)
+
+    # Pass 1: graph facts only
+    graph = build_dependency_graph([
+        {'id': task.get('id', ''), 'dependencies': task.get('dependencies', [])}
+        for task in iter_tasks(input_path, input_format, skipped)
+    ])
+
+    # Pass 2: scoring; pass 1 already reported the skipped rows
+    second_pass_skipped = None if skipped is None else []
+    chunks = _iter_chunks(iter_tasks(input_path, input_format, second_pass_skipped), chunk_size)
+    pool = None
+    if workers > 1:
+        pool = Pool(workers, initializer=_init_worker, initargs=(graph, strategy))
+        scored_chunks = pool.imap(_score_chunk, chunks)
+    else:
+        _init_worker(graph, strategy)
+        scored_chunks = map(_score_chunk, chunks)
+
+    count = 0
+    best: List[Dict] = []
+    succeeded = False
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as handle:
+            writer = _Writer(handle, output_format)
+            for scored in scored_chunks:
+                count += len(scored)
+                if top is None:
+                    writer.write_chunk(scored)
+                else:
+                    best = heapq.nsmallest(top, best + scored, key=ranking_key)
+            if top is not None:
+                writer.write_chunk(best)
+        os.replace(tmp_path, output_path)
+        succeeded = True
+    finally:
+        if not succeeded and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        if pool is not None:
+            if succeeded:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    return count
+
+
+def add_arguments(parser) -> None:
+    """Register the batch scoring options on an argparse-compatible parser."""
+    parser.add_argument('input', help='JSONL or CSV file of tasks')
+    parser.add_argument('output', help='JSONL or CSV file to write scored tasks to')
+    parser.add_argument('--strategy', default="Smart Balance")
+    parser.add_argument('--top', type=int, default=None, help='Only write the top K tasks')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'], default=None)
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], default=None)
+    parser.add_argument('--skip-invalid', action='store_true',
+                        help='Skip and report malformed rows instead of stopping at the first one')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    skipped = [] if args.skip_invalid else None
+    try:
+        count = score_file(
+            args.input, args.output, strategy=args.strategy, top=args.top, workers=args.workers,
+            chunk_size=args.chunk_size, input_format=args.input_format, output_format=args.output_format,
+            skipped=skipped
+        )
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    for error in skipped or []:
+        print(f"Skipped {error}", file=sys.stderr)
+    print(f"Scored {count} tasks into {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Per-workspace caches of dependency graphs, scores and the active strategy.
+
+These entries must be visible to every server process, so the default cache
+has to be shared (see CACHES in settings). Graph and score keys embed the
+workspace's durable WorkspaceGeneration, so a write in one process makes the
+old entries unreachable everywhere, and eviction can never resurrect them.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import WorkspaceGeneration
+from .scoring import build_dependency_graph, compute_scores
+
+
+CACHE_TIMEOUT = 300
+
+
+def _generation_key(workspace):
+    return f"tasks:{workspace}:generation"
+
+
+def workspace_generation(workspace):
+    """Return the workspace's task generation, reading the database only on a cache miss."""
+    key = _generation_key(workspace)
+    generation = cache.get(key)
+    if generation is None:
+        generation = WorkspaceGeneration.objects.filter(workspace=workspace).values_list('generation', flat=True).first() or 0
+        cache.set(key, generation, CACHE_TIMEOUT)
+    return generation
+
+
+def invalidate_workspace(workspace):
+    """Advance the workspace's generation in the current transaction, making cached graphs and scores stale."""
+    with transaction.atomic():
+        updated = WorkspaceGeneration.objects.filter(workspace=workspace).update(generation=F('generation') + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    WorkspaceGeneration.objects.create(workspace=workspace, generation=1)
+            except IntegrityError:
+                # Created concurrently by another writer
+                WorkspaceGeneration.objects.filter(workspace=workspace).update(generation=F('generation') + 1)
+    
+    # Drop the cached generation now, and again once the new value is visible to other connections
+    key = _generation_key(workspace)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_dependency_graph(workspace, generation, task_dicts):
+    """Return the workspace dependency graph, building it on a cache miss."""
+    key = f"tasks:{workspace}:graph:{generation}"
+    graph = cache.get(key)
+    if graph is None:
+        graph = build_dependency_graph(task_dicts)
+        cache.set(key, graph, CACHE_TIMEOUT)
+    return graph
+
+
+def get_cached_scores(workspace, generation, strategy, today):
+    """Return cached scores for a workspace generation/strategy/day, or None."""
+    return cache.get(_scores_key(workspace, generation, strategy, today))
+
+
+def store_scores(workspace, generation, task_dicts, strategy, today, graph=None):
+    """Score a workspace's tasks with the given or cached graph and remember the result."""
+    if graph is None:
+        graph = get_dependency_graph(workspace, generation, task_dicts)
+    scored_tasks = compute_scores(task_dicts, strategy, graph=graph, today=today)
+    cache.set(_scores_key(workspace, generation, strategy, today), scored_tasks, CACHE_TIMEOUT)
+    return scored_tasks
+
+
+def _scores_key(workspace, generation, strategy, today):
+    # Strategy names contain spaces, which some cache backends reject in keys
+    return f"tasks:{workspace}:scores:{generation}:{strategy.replace(' ', '_')}:{today.isoformat()}"
+
+
+# Cached marker for workspaces that have never been analyzed, so misses don't hit the database either
+NO_STRATEGY = ''
+
+
+def _strategy_key(workspace):
+    return f"tasks:{workspace}:strategy"
+
+
+def get_cached_strategy(workspace):
+    """Return the cached active strategy, NO_STRATEGY if known to be unset, or None on a miss."""
+    return cache.get(_strategy_key(workspace))
+
+
+def set_cached_strategy(workspace, strategy):
+    # Bounded so a lost invalidation (e.g. a crash between commit and publish) cannot pin a stale strategy
+    cache.set(_strategy_key(workspace), strategy or NO_STRATEGY, CACHE_TIMEOUT)
+
+
+def clear_cached_strategy(workspace):
+    cache.delete(_strategy_key(workspace))
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import NO_STRATEGY, clear_cached_strategy, get_cached_strategy, set_cached_strategy
+from .models import ActiveStrategy, TaskAnalysis
+
+
+def history_mode():
+    """'changes' (default) keeps one row per strategy change, 'all' one per request, 'none' no history."""
+    return getattr(settings, 'TASK_ANALYSIS_HISTORY', 'changes')
+
+
+def get_active_strategy(workspace):
+    """Return the workspace's active strategy or None, touching the database only on a cache miss."""
+    strategy = get_cached_strategy(workspace)
+    if strategy is None:
+        active = ActiveStrategy.objects.filter(workspace=workspace).only('strategy').first()
+        strategy = active.strategy if active else NO_STRATEGY
+        set_cached_strategy(workspace, strategy)
+    return strategy or None
+
+
+def record_analysis(workspace, strategy):
+    """Make ``strategy`` active for ``workspace`` and record it in the compacted history."""
+    mode = history_mode()
+    now = timezone.now()
+    with transaction.atomic():
+        active = ActiveStrategy.objects.select_for_update().filter(workspace=workspace).first()
+        if active is None:
+            # A missing row cannot be locked, so create it first and fall back to the winner's row
+            try:
+                with transaction.atomic():
+                    active = ActiveStrategy.objects.create(workspace=workspace, strategy=strategy)
+            except IntegrityError:
+                # Created concurrently by another analysis
+                active = ActiveStrategy.objects.select_for_update().get(workspace=workspace)
+        unchanged = active.strategy == strategy
+        analysis_id = active.analysis_id
+        
+        if mode == 'all' or (mode == 'changes' and not (unchanged and analysis_id)):
+            analysis_id = TaskAnalysis.objects.create(workspace=workspace, strategy=strategy).id
+        elif mode == 'changes':
+            TaskAnalysis.objects.filter(pk=analysis_id).update(
+                run_count=F('run_count') + 1, last_analyzed_at=now
+            )
+        
+        if not unchanged or active.analysis_id != analysis_id:
+            active.strategy = strategy
+            active.analysis_id = analysis_id
+            active.save(update_fields=['strategy', 'analysis', 'updated_at'])
+        
+        # Drop the stale value now and publish the new one once the write is visible to other readers
+        clear_cached_strategy(workspace)
+        transaction.on_commit(lambda: set_cached_strategy(workspace, strategy))
+
+
+def prune_history(days=None, keep=None, dry_run=False):
+    """Delete history rows idle for more than ``days`` beyond the newest ``keep`` per workspace.
+
+    Returns the number of rows deleted (or that would be deleted with ``dry_run``).
+    """
+    if days is None:
+        days = getattr(settings, 'TASK_ANALYSIS_RETENTION_DAYS', 90)
+    if keep is None:
+        keep = getattr(settings, 'TASK_ANALYSIS_KEEP_PER_WORKSPACE', 50)
+    cutoff = timezone.now() - timedelta(days=days)
+    
+    deleted = 0
+    workspaces = TaskAnalysis.objects.values_list('workspace', flat=True).order_by().distinct()
+    for workspace in workspaces:
+        history = TaskAnalysis.objects.filter(workspace=workspace)
+        kept_ids = list(history.order_by('-analyzed_at', '-id').values_list('id', flat=True)[:keep])
+        stale = history.filter(last_analyzed_at__lt=cutoff).exclude(pk__in=kept_ids)
+        if dry_run:
+            deleted += stale.count()
+        else:
+            deleted += stale.delete()[0]
+    return deleted
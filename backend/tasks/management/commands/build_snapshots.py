@@ -0,0 +1,29 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Task
+from tasks.snapshot import build_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'Rebuild memory-mapped task snapshots, e.g. before starting workers after a deploy or database restore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workspaces', nargs='*', help='Workspaces to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        directory = snapshot_dir()
+        if directory is None:
+            raise CommandError('TASK_SNAPSHOT_DIR is not configured')
+        workspaces = options['workspaces']
+        if not workspaces:
+            workspaces = set(Task.objects.values_list('workspace', flat=True).order_by().distinct())
+            # Existing files are included so ones left by a flushed or restored database are replaced or removed
+            if os.path.isdir(directory):
+                workspaces.update(name[:-len('.snap')] for name in os.listdir(directory) if name.endswith('.snap'))
+        count = 0
+        for workspace in sorted(workspaces):
+            build_snapshot(workspace)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Built {count} task snapshots in {directory}"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tasks.history import prune_history
+
+
+class Command(BaseCommand):
+    help = 'Delete old TaskAnalysis history rows, keeping the newest rows per workspace.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention window (default: TASK_ANALYSIS_RETENTION_DAYS or 90)')
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Rows always kept per workspace (default: TASK_ANALYSIS_KEEP_PER_WORKSPACE or 50)')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        count = prune_history(days=options['days'], keep=options['keep'], dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} analysis history rows"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.batch import add_arguments, score_file
+
+
+class Command(BaseCommand):
+    help = 'Score a JSONL or CSV task export offline. See tasks.batch for a Django-free entry point.'
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        skipped = [] if options['skip_invalid'] else None
+        try:
+            count = score_file(
+                options['input'], options['output'],
+                strategy=options['strategy'],
+                top=options['top'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                input_format=options['input_format'],
+                output_format=options['output_format'],
+                skipped=skipped
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        for error in skipped or []:
+            self.stderr.write(f"Skipped {error}")
+        self.stdout.write(self.style.SUCCESS(f"Scored {count} tasks into {options['output']}"))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='workspace',
+            field=models.CharField(default='default', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='taskanalysis',
+            name='workspace',
+            field=models.CharField(default='default', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='task_id',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['workspace', 'created_at'], name='task_workspace_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskanalysis',
+            index=models.Index(fields=['workspace', 'analyzed_at'], name='analysis_workspace_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('workspace', 'task_id'), name='unique_task_id_per_workspace'),
+        ),
+    ]
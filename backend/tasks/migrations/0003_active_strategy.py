@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def seed_active_strategies(apps, schema_editor):
+    TaskAnalysis = apps.get_model('tasks', 'TaskAnalysis')
+    ActiveStrategy = apps.get_model('tasks', 'ActiveStrategy')
+    TaskAnalysis.objects.update(last_analyzed_at=models.F('analyzed_at'))
+    workspaces = TaskAnalysis.objects.values_list('workspace', flat=True).distinct()
+    for workspace in workspaces:
+        latest = TaskAnalysis.objects.filter(workspace=workspace).order_by('analyzed_at', 'id').last()
+        ActiveStrategy.objects.create(workspace=workspace, strategy=latest.strategy, analysis=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_workspace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskanalysis',
+            name='last_analyzed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='taskanalysis',
+            name='run_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='ActiveStrategy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workspace', models.CharField(max_length=50, unique=True)),
+                ('strategy', models.CharField(max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('analysis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tasks.taskanalysis')),
+            ],
+        ),
+        migrations.RunPython(seed_active_strategies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+def seed_generations(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    WorkspaceGeneration = apps.get_model('tasks', 'WorkspaceGeneration')
+    workspaces = Task.objects.values_list('workspace', flat=True).order_by().distinct()
+    WorkspaceGeneration.objects.bulk_create(
+        [WorkspaceGeneration(workspace=workspace, generation=1) for workspace in workspaces]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_active_strategy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkspaceGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workspace', models.CharField(max_length=50, unique=True)),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_generations, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,14 @@
 from django.db import models
+from django.utils import timezone
 import json
 
 
+DEFAULT_WORKSPACE = 'default'
+
+
 class Task(models.Model):
-    task_id = models.CharField(max_length=50, unique=True)
+    workspace = models.CharField(max_length=50, default=DEFAULT_WORKSPACE)
+    task_id = models.CharField(max_length=50)
     title = models.CharField(max_length=200)
     due_date = models.DateField(null=True, blank=True)
     estimated_hours = models.FloatField(null=True, blank=True)
@@ -13,15 +18,50 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.task_id}: {self.title}"
+        return f"{self.workspace}/{self.task_id}: {self.title}"
 
     class Meta:
         ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['workspace', 'task_id'], name='unique_task_id_per_workspace'),
+        ]
+        indexes = [
+            models.Index(fields=['workspace', 'created_at'], name='task_workspace_created_idx'),
+        ]
 
 
 class TaskAnalysis(models.Model):
+    """One history row per run of analyses; repeated runs of the same strategy are compacted."""
+    workspace = models.CharField(max_length=50, default=DEFAULT_WORKSPACE)
     strategy = models.CharField(max_length=50, default="Smart Balance")
     analyzed_at = models.DateTimeField(auto_now_add=True)
+    last_analyzed_at = models.DateTimeField(default=timezone.now)
+    run_count = models.PositiveIntegerField(default=1)
     
     def __str__(self):
-        return f"Analysis {self.id} - {self.strategy}"
+        return f"Analysis {self.id} - {self.workspace} - {self.strategy}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['workspace', 'analyzed_at'], name='analysis_workspace_time_idx'),
+        ]
+
+
+class ActiveStrategy(models.Model):
+    """The strategy currently in effect for a workspace, read by suggest through the cache."""
+    workspace = models.CharField(max_length=50, unique=True)
+    strategy = models.CharField(max_length=50)
+    analysis = models.ForeignKey(TaskAnalysis, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.workspace}: {self.strategy}"
+
+
+class WorkspaceGeneration(models.Model):
+    """Durable per-workspace counter bumped by every task write; cached graphs and scores are keyed on it."""
+    workspace = models.CharField(max_length=50, unique=True)
+    generation = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.workspace}: {self.generation}"
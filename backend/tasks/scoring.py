@@ -1,5 +1,19 @@
-from datetime import date
+from bisect import bisect_left
+from datetime import date, timedelta
 from typing import List, Dict, Set, Any
+import heapq
+
+
+# Urgency rises linearly over this many days before the due date
+URGENCY_WINDOW_DAYS = 30
+
+# Strategy weights
+STRATEGIES = {
+    "Smart Balance": {"w_u": 0.35, "w_i": 0.30, "w_e": 0.20, "w_d": 0.15},
+    "Fastest Wins": {"w_u": 0.15, "w_i": 0.15, "w_e": 0.60, "w_d": 0.10},
+    "High Impact": {"w_u": 0.25, "w_i": 0.55, "w_e": 0.05, "w_d": 0.15},
+    "Deadline Driven": {"w_u": 0.70, "w_i": 0.15, "w_e": 0.05, "w_d": 0.10}
+}
 
 
 def urgency_score(days_left):
@@ -8,7 +22,7 @@ def urgency_score(days_left):
         return 0.2
     if days_left <= 0:
         return 1.0
-    return max(0.0, min(1.0, (30 - days_left) / 30.0))
+    return max(0.0, min(1.0, (URGENCY_WINDOW_DAYS - days_left) / float(URGENCY_WINDOW_DAYS)))
 
 
 def importance_score(importance):
@@ -31,6 +45,15 @@ def dependency_score(blocks_count):
     return min(1.0, blocks_count / 3.0)
 
 
+def priority_label(final_score):
+    """Map a 0-100 score to its High/Medium/Low label."""
+    if final_score >= 75:
+        return "High"
+    elif final_score >= 50:
+        return "Medium"
+    return "Low"
+
+
 def detect_cycles(tasks: List[Dict]) -> Set[str]:
     """Detect circular dependencies using DFS with white/gray/black coloring."""
     # Build adjacency list
@@ -42,59 +65,55 @@ def detect_cycles(tasks: List[Dict]) -> Set[str]:
         task_ids.add(task_id)
         graph[task_id] = task.get('dependencies', [])
     
-    # DFS cycle detection with proper cycle collection
+    # Iterative DFS cycle detection with proper cycle collection; an explicit
+    # stack keeps long dependency chains from hitting the recursion limit
     WHITE, GRAY, BLACK = 0, 1, 2
     colors = {task_id: WHITE for task_id in task_ids}
     cycle_nodes = set()
     current_path = []
     
-    def dfs(node):
-        if colors[node] == GRAY:  # Back edge found - cycle detected
-            # Add all nodes in current path from this node onwards to cycle_nodes
-            cycle_start_idx = current_path.index(node)
-            for i in range(cycle_start_idx, len(current_path)):
-                cycle_nodes.add(current_path[i])
-            cycle_nodes.add(node)
-            return True
-        
-        if colors[node] == BLACK:  # Already processed
-            return False
-            
-        colors[node] = GRAY
-        current_path.append(node)
-        
-        cycle_found = False
-        for neighbor in graph.get(node, []):
-            if neighbor in task_ids:  # Only check dependencies that exist in our task set
-                if dfs(neighbor):
-                    cycle_found = True
-        
-        current_path.pop()
-        colors[node] = BLACK
-        return cycle_found
-    
-    for task_id in task_ids:
-        if colors[task_id] == WHITE:
-            dfs(task_id)
+    for root in task_ids:
+        if colors[root] != WHITE:
+            continue
+        colors[root] = GRAY
+        current_path.append(root)
+        stack = [(root, iter(graph.get(root, [])))]
+        while stack:
+            node, neighbors = stack[-1]
+            for neighbor in neighbors:
+                if neighbor not in task_ids:  # Only check dependencies that exist in our task set
+                    continue
+                if colors[neighbor] == GRAY:  # Back edge found - cycle detected
+                    # Add all nodes in current path from this node onwards to cycle_nodes
+                    cycle_start_idx = current_path.index(neighbor)
+                    cycle_nodes.update(current_path[cycle_start_idx:])
+                elif colors[neighbor] == WHITE:
+                    colors[neighbor] = GRAY
+                    current_path.append(neighbor)
+                    stack.append((neighbor, iter(graph.get(neighbor, []))))
+                    break
+            else:
+                # Every neighbor processed
+                stack.pop()
+                current_path.pop()
+                colors[node] = BLACK
     
     return cycle_nodes
 
 
-def compute_scores(tasks: List[Dict], strategy: str = "Smart Balance") -> List[Dict]:
-    """Compute scores for all tasks based on strategy."""
-    if not tasks:
-        return []
-    
-    # Strategy weights
-    strategies = {
-        "Smart Balance": {"w_u": 0.35, "w_i": 0.30, "w_e": 0.20, "w_d": 0.15},
-        "Fastest Wins": {"w_u": 0.15, "w_i": 0.15, "w_e": 0.60, "w_d": 0.10},
-        "High Impact": {"w_u": 0.25, "w_i": 0.55, "w_e": 0.05, "w_d": 0.15},
-        "Deadline Driven": {"w_u": 0.70, "w_i": 0.15, "w_e": 0.05, "w_d": 0.10}
-    }
-    
-    weights = strategies.get(strategy, strategies["Smart Balance"])
-    
+def ranking_key(task: Dict) -> tuple:
+    """Sort key for scored tasks; ties are broken deterministically."""
+    return (
+        -task['score'],  # Higher score first
+        -task['importance'],  # Higher importance first
+        task['due_date'] if task['due_date'] else date.max,  # Earlier due date first
+        task['estimated_hours'],  # Lower hours first
+        task['id']  # Stable sort by id
+    )
+
+
+def build_dependency_graph(tasks: List[Dict]) -> Dict[str, Any]:
+    """Collect the date and strategy independent graph facts for a task set."""
     # Detect cycles once for all tasks
     cycle_nodes = detect_cycles(tasks)
     
@@ -107,9 +126,27 @@ def compute_scores(tasks: List[Dict], strategy: str = "Smart Balance") -> List[D
             if dep_id in dependency_counts:
                 dependency_counts[dep_id] += 1
     
+    return {'cycle_nodes': cycle_nodes, 'dependency_counts': dependency_counts}
+
+
+def compute_scores(tasks: List[Dict], strategy: str = "Smart Balance", graph: Dict[str, Any] = None,
+                   today: date = None) -> List[Dict]:
+    """Compute scores for all tasks based on strategy, as of ``today`` (default: the current date)."""
+    if not tasks:
+        return []
+    
+    weights = STRATEGIES.get(strategy, STRATEGIES["Smart Balance"])
+    
+    # Cycles and dependency counts are strategy independent, so callers may pass a cached graph
+    if graph is None:
+        graph = build_dependency_graph(tasks)
+    cycle_nodes = graph['cycle_nodes']
+    dependency_counts = graph['dependency_counts']
+    
     # Process each task
     scored_tasks = []
-    today = date.today()
+    if today is None:
+        today = date.today()
     
     for task in tasks:
         task_id = task.get('id', '')
@@ -155,12 +192,7 @@ def compute_scores(tasks: List[Dict], strategy: str = "Smart Balance") -> List[D
         final_score = round(base * 100, 2)
         
         # Priority label
-        if final_score >= 75:
-            priority = "High"
-        elif final_score >= 50:
-            priority = "Medium"
-        else:
-            priority = "Low"
+        priority = priority_label(final_score)
         
         # Generate explanation
         urgency_text = "no due date"
@@ -197,12 +229,80 @@ def compute_scores(tasks: List[Dict], strategy: str = "Smart Balance") -> List[D
         scored_tasks.append(scored_task)
     
     # Optimized sorting with stable sort
-    scored_tasks.sort(key=lambda task: (
-        -task['score'],  # Higher score first
-        -task['importance'],  # Higher importance first
-        task['due_date'] if task['due_date'] else date.max,  # Earlier due date first
-        task['estimated_hours'],  # Lower hours first
-        task['id']  # Stable sort by id
-    ))
+    scored_tasks.sort(key=ranking_key)
     
     return scored_tasks
+
+
+def rank_horizon(tasks: List[Dict], strategy: str = "Smart Balance", start: date = None, days: int = 14,
+                 top_k: int = 3, graph: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Rank tasks for each day of a what-if horizon without rescoring from scratch.
+    
+    Only urgency depends on the date, and it is flat outside the urgency window,
+    so after the first day only tasks due within the window are re-scored.
+    Each day reports its top-K plus whether the top-K order or any priority
+    label changed since the previous day.
+    """
+    if start is None:
+        start = date.today()
+    if graph is None:
+        graph = build_dependency_graph(tasks)
+    weights = STRATEGIES.get(strategy, STRATEGIES["Smart Balance"])
+    
+    scored_tasks = compute_scores(tasks, strategy, graph=graph, today=start)
+    
+    # Date independent weighted terms, kept separate so day scores add up in the same order as compute_scores
+    static_terms = [
+        (
+            weights["w_i"] * importance_score(task['importance']),
+            weights["w_e"] * effort_score(task['estimated_hours']),
+            weights["w_d"] * dependency_score(graph['dependency_counts'].get(task['id'], 0))
+        )
+        for task in scored_tasks
+    ]
+    
+    # Tasks with a due date, ordered by it, so each day's window is a bisect away
+    dated = sorted((task['due_date'], index) for index, task in enumerate(scored_tasks) if task['due_date'])
+    due_dates = [due_date for due_date, _ in dated]
+    
+    horizon = []
+    previous_top = None
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        priority_changes = []
+        
+        if offset:
+            # Urgency only moves for tasks due in [day, day + window)
+            lo = bisect_left(due_dates, day)
+            hi = bisect_left(due_dates, day + timedelta(days=URGENCY_WINDOW_DAYS))
+            for _, index in dated[lo:hi]:
+                task = scored_tasks[index]
+                I, E, D = static_terms[index]
+                base = weights["w_u"] * urgency_score((task['due_date'] - day).days) + I + E + D
+                if task['in_cycle']:
+                    base = base * 0.75
+                task['score'] = round(base * 100, 2)
+                priority = priority_label(task['score'])
+                if priority != task['priority']:
+                    priority_changes.append({'id': task['id'], 'from': task['priority'], 'to': priority})
+                    task['priority'] = priority
+        
+        top = [
+            {'id': task['id'], 'title': task['title'], 'score': task['score'], 'priority': task['priority']}
+            for task in heapq.nsmallest(top_k, scored_tasks, key=ranking_key)
+        ]
+        top_ids = [task['id'] for task in top]
+        horizon.append({
+            'date': day,
+            'top': top,
+            'ranking_changed': previous_top is not None and top_ids != previous_top,
+            'priority_changes': priority_changes
+        })
+        previous_top = top_ids
+    
+    return {
+        'strategy': strategy,
+        'start': start,
+        'days': horizon,
+        'change_dates': [entry['date'] for entry in horizon if entry['ranking_changed'] or entry['priority_changes']]
+    }
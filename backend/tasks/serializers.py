@@ -14,11 +14,27 @@ class TaskSerializer(serializers.Serializer):
     )
 
 
+class TaskDependenciesSerializer(serializers.Serializer):
+    """Validates the dependency list of a stored task; other fields keep the view's lenient defaults."""
+    dependencies = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        default=list
+    )
+
+
 class AnalyzeRequestSerializer(serializers.Serializer):
     strategy = serializers.CharField(required=False, default="Smart Balance")
     tasks = TaskSerializer(many=True)
 
 
+class HorizonRequestSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(required=False, default=14, min_value=1, max_value=366)
+    top = serializers.IntegerField(required=False, default=3, min_value=1, max_value=100)
+    strategy = serializers.CharField(required=False)
+
+
 class TaskResultSerializer(serializers.Serializer):
     id = serializers.CharField()
     title = serializers.CharField()
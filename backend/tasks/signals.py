@@ -0,0 +1,70 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_workspace
+from .models import Task
+from .snapshot import build_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+# workspace -> Timer for rebuilds waiting out TASK_SNAPSHOT_REBUILD_DELAY
+_scheduled_rebuilds = {}
+_scheduled_rebuilds_lock = threading.Lock()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_caches(sender, instance, **kwargs):
+    """Any task write makes its workspace's cached graph and scores stale."""
+    invalidate_workspace(instance.workspace)
+
+
+def _rebuild_snapshot(workspace):
+    try:
+        build_snapshot(workspace)
+    except Exception:
+        # The write is already committed; readers keep the previous snapshot until the next rebuild
+        logger.exception("Failed to rebuild task snapshot for workspace %s", workspace)
+
+
+def _run_scheduled_rebuild(workspace):
+    # Unschedule first, so writes committed while this rebuild runs schedule another one
+    with _scheduled_rebuilds_lock:
+        _scheduled_rebuilds.pop(workspace, None)
+    try:
+        _rebuild_snapshot(workspace)
+    finally:
+        connection.close()
+
+
+def schedule_rebuild(workspace):
+    """Rebuild now, or once per TASK_SNAPSHOT_REBUILD_DELAY window when a delay is configured."""
+    delay = getattr(settings, 'TASK_SNAPSHOT_REBUILD_DELAY', 0)
+    if not delay:
+        _rebuild_snapshot(workspace)
+        return
+    with _scheduled_rebuilds_lock:
+        if workspace in _scheduled_rebuilds:
+            return
+        # Not a daemon thread, so a pending rebuild still runs when the worker shuts down
+        timer = threading.Timer(delay, _run_scheduled_rebuild, args=(workspace,))
+        _scheduled_rebuilds[workspace] = timer
+    timer.start()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def refresh_task_snapshot(sender, instance, **kwargs):
+    """Rebuild the workspace snapshot once the write and its generation bump are committed.
+
+    Every write in a transaction queues a rebuild, but only the first one
+    reads and writes the workspace; the rest find the file already current.
+    """
+    workspace = instance.workspace
+    transaction.on_commit(lambda: schedule_rebuild(workspace))
@@ -0,0 +1,394 @@
+"""Read-only, memory-mapped snapshots of a workspace's tasks.
+
+Each workspace is written to ``TASK_SNAPSHOT_DIR/<workspace>.snap`` as fixed
+width columns plus a CSR (indptr/indices) dependency adjacency. Worker
+processes map the file and read the columns through memoryviews, so every
+worker shares the same page-cache copy and a new worker starts without loading
+the Task table.
+
+Every file is tagged with the workspace's durable WorkspaceGeneration, which
+task writes bump inside their transaction. A rebuild runs after the write
+commits and atomically replaces the file, and a build never replaces a file
+with a newer generation, so a slow reader-side rebuild cannot overwrite fresher
+data. Generations only go backwards when the database is flushed or restored,
+so a file ahead of the database's generation is always replaced. Until the
+rebuild lands, readers keep serving the previous file. They notice the new
+inode on their next lookup and swap to it, while requests still holding the
+old mapping keep reading it safely.
+
+Layout (host byte order, every section 8-byte aligned after the header):
+    header, due ordinals (int32, 0 = none), importance (int64, MISSING_INT = none),
+    estimated hours (float64, NaN = none), title offsets (uint64, n + 1),
+    string offsets (uint64, strings + 1), title bytes, string bytes,
+    dependency indptr (uint64, n + 1), dependency indices (uint32).
+The string table holds the n task ids first, then any dependency ids that are
+not tasks in the workspace, so an index below n is an edge to another task.
+"""
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Task, WorkspaceGeneration
+from .scoring import build_dependency_graph, detect_cycles
+
+
+MAGIC = b'TASKSNAP'
+FORMAT_VERSION = 2
+# magic, format version, padding, generation, tasks, strings, edges, title bytes, string bytes
+HEADER = struct.Struct('=8sIIQQQQQQ')
+MISSING_INT = -(2 ** 63)
+
+
+def snapshot_dir():
+    """Return the configured snapshot directory, or None when snapshots are disabled."""
+    directory = getattr(settings, 'TASK_SNAPSHOT_DIR', None)
+    return str(directory) if directory else None
+
+
+def snapshot_path(workspace):
+    directory = snapshot_dir()
+    return os.path.join(directory, f"{workspace}.snap") if directory else None
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(n, n_strings, n_edges, titles_len, strings_len):
+    """Return {section: (offset, byte length)} for the given counts."""
+    sizes = [
+        ('due', 4 * n),
+        ('importance', 8 * n),
+        ('hours', 8 * n),
+        ('title_offsets', 8 * (n + 1)),
+        ('string_offsets', 8 * (n_strings + 1)),
+        ('titles', titles_len),
+        ('strings', strings_len),
+        ('indptr', 8 * (n + 1)),
+        ('indices', 4 * n_edges),
+    ]
+    layout = {}
+    offset = _align(HEADER.size)
+    for name, size in sizes:
+        layout[name] = (offset, size)
+        offset = _align(offset + size)
+    layout['end'] = (offset, 0)
+    return layout
+
+
+def _encode_strings(values):
+    offsets = array('Q', [0])
+    blob = bytearray()
+    for value in values:
+        blob += str(value).encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def _dependency_ids(dependencies):
+    """Stringify stored dependency ids, ignoring values that are not a list (rows written before validation)."""
+    if not isinstance(dependencies, list):
+        return []
+    return [str(dep_id) for dep_id in dependencies if dep_id is not None]
+
+
+def read_generation(path):
+    """Return the generation recorded in a snapshot file, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'rb') as handle:
+            header = handle.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, version, _, generation = HEADER.unpack(header)[:4]
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    return generation
+
+
+@contextmanager
+def _write_lock(directory):
+    """Serialize compare-and-replace across processes sharing the snapshot directory."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _left_by_previous_database(current, current_generation):
+    """True when a file's generation is ahead of the database, e.g. after a flush or restore."""
+    if current_generation is None:
+        return False
+    database_generation = current_generation()
+    return database_generation is None or current > database_generation
+
+
+def write_snapshot(path, rows, generation, current_generation=None):
+    """Atomically write ``rows`` of (task_id, title, due_date, estimated_hours, importance, dependencies).
+
+    Returns False without writing when the file already holds ``generation`` or a newer one.
+    ``current_generation`` may return the database's current generation; a file
+    ahead of it was left by a previous database and is replaced anyway.
+    """
+    n = len(rows)
+    strings = [str(row[0]) for row in rows]
+    index = {task_id: i for i, task_id in enumerate(strings)}
+
+    due = array('i')
+    importance = array('q')
+    hours = array('d')
+    indptr = array('Q', [0])
+    indices = array('I')
+    for task_id, title, due_date, estimated_hours, task_importance, dependencies in rows:
+        due.append(due_date.toordinal() if due_date else 0)
+        importance.append(MISSING_INT if task_importance is None else task_importance)
+        hours.append(math.nan if estimated_hours is None else estimated_hours)
+        for dep_id in _dependency_ids(dependencies):
+            if dep_id not in index:
+                index[dep_id] = len(strings)
+                strings.append(dep_id)
+            indices.append(index[dep_id])
+        indptr.append(len(indices))
+
+    title_offsets, titles = _encode_strings([row[1] for row in rows])
+    string_offsets, string_blob = _encode_strings(strings)
+    layout = _layout(n, len(strings), len(indices), len(titles), len(string_blob))
+    sections = {
+        'due': due.tobytes(),
+        'importance': importance.tobytes(),
+        'hours': hours.tobytes(),
+        'title_offsets': title_offsets.tobytes(),
+        'string_offsets': string_offsets.tobytes(),
+        'titles': titles,
+        'strings': string_blob,
+        'indptr': indptr.tobytes(),
+        'indices': indices.tobytes(),
+    }
+
+    buffer = bytearray(layout['end'][0])
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, 0, generation, n, len(strings), len(indices),
+                     len(titles), len(string_blob))
+    for name, data in sections.items():
+        offset, _ = layout[name]
+        buffer[offset:offset + len(data)] = data
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with _write_lock(directory):
+        current = read_generation(path)
+        if current is not None and current >= generation and not _left_by_previous_database(current, current_generation):
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(buffer)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return True
+
+
+class TaskSnapshot:
+    """A mapped snapshot file; columns are memoryviews over the shared mapping.
+
+    The snapshot is also a sequence of task dicts, decoded only as they are read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            stat = os.fstat(handle.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        (magic, version, _, self.generation, self.size, n_strings, n_edges,
+         titles_len, strings_len) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported task snapshot: {path}")
+
+        layout = _layout(self.size, n_strings, n_edges, titles_len, strings_len)
+
+        def section(name, fmt=None):
+            offset, length = layout[name]
+            part = view[offset:offset + length]
+            return part.cast(fmt) if fmt else part
+
+        self.due = section('due', 'i')
+        self.importance = section('importance', 'q')
+        self.hours = section('hours', 'd')
+        self.title_offsets = section('title_offsets', 'Q')
+        self.string_offsets = section('string_offsets', 'Q')
+        self.titles = section('titles')
+        self.strings = section('strings')
+        self.indptr = section('indptr', 'Q')
+        self.indices = section('indices', 'I')
+        self._graph = None
+
+    def _string(self, i):
+        return str(self.strings[self.string_offsets[i]:self.string_offsets[i + 1]], 'utf-8')
+
+    def task_dict(self, i):
+        """Decode task ``i`` into the dict format used for scoring."""
+        due = self.due[i]
+        importance = self.importance[i]
+        hours = self.hours[i]
+        return {
+            'id': self._string(i),
+            'title': str(self.titles[self.title_offsets[i]:self.title_offsets[i + 1]], 'utf-8'),
+            'due_date': date.fromordinal(due) if due else None,
+            'estimated_hours': None if math.isnan(hours) else hours,
+            'importance': None if importance == MISSING_INT else importance,
+            'dependencies': [self._string(j) for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+        }
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return self.task_dict(i)
+
+    def __iter__(self):
+        return (self.task_dict(i) for i in range(self.size))
+
+    def task_dicts(self):
+        return list(self)
+
+    def dependency_graph(self):
+        """Graph facts in build_dependency_graph's format, computed once per mapped generation."""
+        if self._graph is None:
+            n = self.size
+            ids = [self._string(i) for i in range(n)]
+            counts = [0] * n
+            adjacency = []
+            for i in range(n):
+                edges = [j for j in self.indices[self.indptr[i]:self.indptr[i + 1]] if j < n]
+                for j in edges:
+                    counts[j] += 1
+                adjacency.append({'id': ids[i], 'dependencies': [ids[j] for j in edges]})
+            self._graph = {
+                'cycle_nodes': detect_cycles(adjacency),
+                'dependency_counts': dict(zip(ids, counts))
+            }
+        return self._graph
+
+
+class EmptySnapshot:
+    """Stand-in for workspaces that have never had a task; nothing is written to disk for them."""
+    generation = 0
+    size = 0
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+    def task_dicts(self):
+        return []
+
+    def dependency_graph(self):
+        return build_dependency_graph([])
+
+
+EMPTY_SNAPSHOT = EmptySnapshot()
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def build_snapshot(workspace):
+    """Write a snapshot of ``workspace`` from the database, tagged with its generation.
+
+    Returns the generation, or None when snapshots are disabled or the
+    workspace has never been written to (no file is created for it, and one
+    left behind by a flushed or restored database is removed).
+    """
+    path = snapshot_path(workspace)
+    if path is None:
+        return None
+
+    def current_generation():
+        return WorkspaceGeneration.objects.filter(workspace=workspace).values_list('generation', flat=True).first()
+
+    with transaction.atomic():
+        # Read the generation before the rows, so the rows are never older than the tag
+        generation = current_generation()
+        if generation is None:
+            rows = None
+        elif read_generation(path) == generation:
+            # Already rebuilt for this generation, e.g. by an earlier write in the same transaction
+            return generation
+        else:
+            rows = list(
+                Task.objects.filter(workspace=workspace).values_list(
+                    'task_id', 'title', 'due_date', 'estimated_hours', 'importance', 'dependencies'
+                )
+            )
+    if generation is None:
+        _discard_snapshot(path, current_generation)
+        return None
+    write_snapshot(path, rows, generation, current_generation)
+    return generation
+
+
+def _discard_snapshot(path, current_generation):
+    """Remove a file the database has no generation for, unless a first write has just created one."""
+    if not os.path.exists(path):
+        return
+    with _write_lock(os.path.dirname(path)):
+        if current_generation() is None and os.path.exists(path):
+            os.unlink(path)
+
+
+def get_snapshot(workspace):
+    """Return the current mapped snapshot for ``workspace``, or None when snapshots are disabled.
+
+    A missing file is built from the database, and a replaced file is remapped.
+    A workspace with no tasks ever gets EMPTY_SNAPSHOT.
+    """
+    path = snapshot_path(workspace)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        if build_snapshot(workspace) is None:
+            return EMPTY_SNAPSHOT
+        stat = os.stat(path)
+    identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    with _snapshots_lock:
+        current = _snapshots.get(path)
+        if current is not None and current.identity == identity:
+            return current
+    # The file on disk is authoritative, even when its generation went backwards after a
+    # database reset; a racing thread that maps an older inode is corrected on the next lookup
+    snapshot = TaskSnapshot(path)
+    with _snapshots_lock:
+        _snapshots[path] = snapshot
+    return snapshot
@@ -1,6 +1,23 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from io import StringIO
+from unittest import mock
+import json
+import os
+import tempfile
+from rest_framework.test import APIClient
 from datetime import date, timedelta
-from .scoring import urgency_score, importance_score, effort_score, dependency_score, detect_cycles, compute_scores
+from .models import Task, TaskAnalysis, ActiveStrategy
+from .cache import workspace_generation
+from .history import get_active_strategy, record_analysis, prune_history
+from .signals import schedule_rebuild
+from . import batch, signals
+from .batch import BatchInputError, iter_tasks, score_file
+from .admission import AdmissionController, AdmissionRejected, get_controller, reset_controller
+from .snapshot import TaskSnapshot, build_snapshot, get_snapshot, snapshot_path, write_snapshot
+from .scoring import urgency_score, importance_score, effort_score, dependency_score, detect_cycles, compute_scores, rank_horizon, build_dependency_graph
 
 
 class ScoringAlgorithmTests(TestCase):
@@ -67,6 +84,14 @@ class ScoringAlgorithmTests(TestCase):
         avg_score_no_cycle = sum(task['score'] for task in results_no_cycle) / len(results_no_cycle)
         self.assertGreater(avg_score_no_cycle, avg_score_cycle)
     
+    def test_deep_dependency_chain(self):
+        """Long chains are walked without recursion and a cycle at the end is still found."""
+        chain = [{'id': f'T{i}', 'dependencies': [f'T{i + 1}']} for i in range(5000)]
+        self.assertEqual(detect_cycles(chain), set())
+        
+        chain[-1]['dependencies'] = ['T4998']
+        self.assertEqual(detect_cycles(chain), {'T4998', 'T4999'})
+    
     def test_strategy_switching(self):
         """Test that different strategies produce different task orderings."""
         tasks = [
@@ -138,3 +163,588 @@ class ScoringAlgorithmTests(TestCase):
             self.assertIsNotNone(task['score'])
             self.assertIn(task['priority'], ['High', 'Medium', 'Low'])
             self.assertIsNotNone(task['explanation'])
+
+
+class ServiceTestCase(TestCase):
+    """Isolates the shared cache and snapshot directory between API tests."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        self.snapshot_dir = snapshot_dir.name
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(
+            TASK_SNAPSHOT_DIR=snapshot_dir.name,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir.name}}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class WorkspaceIsolationTests(ServiceTestCase):
+    
+    def test_task_ids_are_unique_per_workspace(self):
+        """The same task id can exist in different workspaces without clashing."""
+        self.client.post('/api/tasks/', {'id': 't1', 'title': 'Alpha task'}, format='json', HTTP_X_WORKSPACE='alpha')
+        self.client.post('/api/tasks/', {'id': 't1', 'title': 'Beta task'}, format='json', HTTP_X_WORKSPACE='beta')
+        
+        self.assertEqual(Task.objects.filter(task_id='t1').count(), 2)
+        
+        alpha = self.client.get('/api/tasks/', HTTP_X_WORKSPACE='alpha').json()['tasks']
+        self.assertEqual([task['title'] for task in alpha], ['Alpha task'])
+        
+        self.client.delete('/api/tasks/', {'id': 't1'}, format='json', HTTP_X_WORKSPACE='beta')
+        self.assertTrue(Task.objects.filter(workspace='alpha', task_id='t1').exists())
+        self.assertFalse(Task.objects.filter(workspace='beta', task_id='t1').exists())
+    
+    def test_suggest_uses_only_callers_tasks_and_strategy(self):
+        """Suggest scores the caller's workspace with the caller's latest strategy."""
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', estimated_hours=1, importance=5)
+        Task.objects.create(workspace='beta', task_id='b1', title='Beta', estimated_hours=1, importance=9)
+        record_analysis('alpha', 'Fastest Wins')
+        
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['id'] for task in response.json()['top']], ['a1'])
+        
+        # Beta has tasks but has never been analyzed
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='beta')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_task_writes_invalidate_workspace_cache(self):
+        """Cached suggestions are refreshed after a task in the workspace changes."""
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', estimated_hours=1, importance=5)
+        record_analysis('alpha', 'High Impact')
+        self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        
+        # The workspace snapshot is rebuilt once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/', {'id': 'a2', 'title': 'Urgent', 'importance': 10}, format='json', HTTP_X_WORKSPACE='alpha')
+        
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a2')
+    
+    def test_generation_is_durable_across_cache_eviction(self):
+        """Losing cached entries reloads the generation from the database instead of resetting it."""
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha')
+        Task.objects.create(workspace='alpha', task_id='a2', title='Alpha 2')
+        self.assertEqual(workspace_generation('alpha'), 2)
+        
+        cache.clear()
+        self.assertEqual(workspace_generation('alpha'), 2)
+        self.assertEqual(workspace_generation('beta'), 0)
+    
+    def test_invalid_workspace_is_rejected(self):
+        response = self.client.get('/api/tasks/', HTTP_X_WORKSPACE='bad workspace!')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchScoringTests(TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tasks = [
+            {'id': 'A', 'title': 'Task A', 'estimated_hours': 8, 'importance': 2, 'dependencies': []},
+            {'id': 'B', 'title': 'Task B', 'estimated_hours': 1, 'importance': 9, 'dependencies': ['A']},
+            {'id': 'C', 'title': 'Task C', 'estimated_hours': 4, 'importance': 6, 'dependencies': ['A']},
+        ]
+    
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+    
+    def write_jsonl(self, name):
+        with open(self.path(name), 'w') as handle:
+            for task in self.tasks:
+                handle.write(json.dumps(task) + '\n')
+        return self.path(name)
+    
+    def read_jsonl(self, name):
+        with open(self.path(name)) as handle:
+            return [json.loads(line) for line in handle]
+    
+    def test_chunked_scores_match_in_memory_scores(self):
+        """Graph facts come from the whole file even when chunks split dependencies."""
+        source = self.write_jsonl('in.jsonl')
+        count = score_file(source, self.path('out.jsonl'), strategy='High Impact', chunk_size=1)
+        
+        self.assertEqual(count, 3)
+        expected = {task['id']: task['score'] for task in compute_scores(self.tasks, 'High Impact')}
+        actual = {task['id']: task['score'] for task in self.read_jsonl('out.jsonl')}
+        self.assertEqual(actual, expected)
+    
+    def test_top_k_is_globally_ranked(self):
+        source = self.write_jsonl('in.jsonl')
+        score_file(source, self.path('top.jsonl'), top=2, chunk_size=1)
+        
+        expected = [task['id'] for task in compute_scores(self.tasks)[:2]]
+        self.assertEqual([task['id'] for task in self.read_jsonl('top.jsonl')], expected)
+    
+    def test_jsonl_rows_are_normalized_like_csv(self):
+        """String numbers and null dependencies do not break scoring, including in worker pools."""
+        with open(self.path('in.jsonl'), 'w') as handle:
+            handle.write(json.dumps({'id': 'A', 'title': 'Task A', 'importance': '7', 'estimated_hours': '2', 'dependencies': None}) + '\n')
+            handle.write(json.dumps({'id': 'B', 'title': 'Task B', 'importance': 3, 'dependencies': 'A'}) + '\n')
+        
+        count = score_file(self.path('in.jsonl'), self.path('out.csv'), workers=2, chunk_size=1)
+        self.assertEqual(count, 2)
+        parsed = list(iter_tasks(self.path('in.jsonl')))
+        self.assertEqual((parsed[0]['importance'], parsed[0]['estimated_hours'], parsed[0]['dependencies']), (7, 2.0, []))
+        self.assertEqual(parsed[1]['dependencies'], ['A'])
+    
+    def test_non_finite_numbers_fall_back_to_defaults(self):
+        with open(self.path('in.jsonl'), 'w') as handle:
+            handle.write('{"id": "A", "title": "Task A", "importance": 1e999, "estimated_hours": "nan"}\n')
+            handle.write('{"id": "B", "title": "Task B", "importance": "-inf", "estimated_hours": "inf"}\n')
+        
+        self.assertEqual(score_file(self.path('in.jsonl'), self.path('out.jsonl')), 2)
+        with open(self.path('out.jsonl')) as handle:
+            self.assertNotIn('NaN', handle.read())
+        self.assertEqual([(task['importance'], task['estimated_hours']) for task in self.read_jsonl('out.jsonl')],
+                         [(5, 0.5), (5, 0.5)])
+    
+    def test_bad_rows_fail_cleanly_or_are_skipped(self):
+        with open(self.path('in.jsonl'), 'w') as handle:
+            handle.write(json.dumps(self.tasks[0]) + '\n')
+            handle.write('{not json\n')
+            handle.write(json.dumps({'id': 'X', 'dependencies': 5}) + '\n')
+        with open(self.path('out.jsonl'), 'w') as handle:
+            handle.write('previous run\n')
+        
+        with self.assertRaises(BatchInputError) as raised:
+            score_file(self.path('in.jsonl'), self.path('out.jsonl'))
+        self.assertEqual(raised.exception.line_number, 2)
+        # A failed run leaves the previous output untouched and no temporary files behind
+        with open(self.path('out.jsonl')) as handle:
+            self.assertEqual(handle.read(), 'previous run\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['in.jsonl', 'out.jsonl'])
+        
+        skipped = []
+        self.assertEqual(score_file(self.path('in.jsonl'), self.path('out.jsonl'), skipped=skipped), 1)
+        self.assertEqual([error.split(':')[0] for error in skipped], ['line 2', 'line 3'])
+        
+        with self.assertRaises(CommandError):
+            call_command('score_tasks', self.path('in.jsonl'), self.path('out.jsonl'), stdout=StringIO())
+    
+    def test_deep_dependency_chain(self):
+        self.tasks = [{'id': f'T{i}', 'title': f'Task {i}', 'dependencies': [f'T{i + 1}']} for i in range(3000)]
+        source = self.write_jsonl('in.jsonl')
+        self.assertEqual(score_file(source, self.path('out.jsonl')), 3000)
+    
+    def test_large_inputs_are_memory_mapped(self):
+        source = self.write_jsonl('in.jsonl')
+        with mock.patch.object(batch, 'MMAP_THRESHOLD', 1), mock.patch.object(batch.mmap, 'mmap', wraps=batch.mmap.mmap) as mapped:
+            score_file(source, self.path('out.jsonl'))
+        self.assertTrue(mapped.called)
+        self.assertEqual(len(self.read_jsonl('out.jsonl')), 3)
+    
+    def test_csv_input_and_management_command(self):
+        with open(self.path('in.csv'), 'w') as handle:
+            handle.write('id,title,due_date,estimated_hours,importance,dependencies\n')
+            handle.write('A,Task A,,8,2,\n')
+            handle.write('B,Task B,,1,9,A\n')
+            handle.write('C,Task C,,4,6,A\n')
+        
+        parsed = list(iter_tasks(self.path('in.csv')))
+        self.assertEqual(parsed[1]['dependencies'], ['A'])
+        self.assertEqual(parsed[0]['importance'], 2)
+        
+        out = StringIO()
+        call_command('score_tasks', self.path('in.csv'), self.path('out.csv'), '--workers', '2', stdout=out)
+        self.assertIn('Scored 3 tasks', out.getvalue())
+        with open(self.path('out.csv')) as handle:
+            self.assertEqual(len(handle.readlines()), 4)
+
+
+class AnalysisHistoryTests(ServiceTestCase):
+    
+    def test_repeated_strategy_is_compacted(self):
+        """Re-running the same strategy bumps the current row instead of inserting."""
+        record_analysis('alpha', 'Smart Balance')
+        record_analysis('alpha', 'Smart Balance')
+        record_analysis('alpha', 'High Impact')
+        record_analysis('alpha', 'High Impact')
+        
+        history = list(TaskAnalysis.objects.filter(workspace='alpha').order_by('id'))
+        self.assertEqual([(row.strategy, row.run_count) for row in history], [('Smart Balance', 2), ('High Impact', 2)])
+        self.assertEqual(ActiveStrategy.objects.get(workspace='alpha').analysis_id, history[-1].id)
+    
+    @override_settings(TASK_ANALYSIS_HISTORY='all')
+    def test_full_history_mode_keeps_every_run(self):
+        record_analysis('alpha', 'Smart Balance')
+        record_analysis('alpha', 'Smart Balance')
+        self.assertEqual(TaskAnalysis.objects.filter(workspace='alpha').count(), 2)
+    
+    def test_concurrent_first_analysis_reuses_the_winning_row(self):
+        """A row created between the locking read and the insert is locked and updated instead."""
+        ActiveStrategy.objects.create(workspace='alpha', strategy='Smart Balance')
+        select_for_update = ActiveStrategy.objects.select_for_update
+        lookups = [ActiveStrategy.objects.none()]
+        with mock.patch.object(ActiveStrategy.objects, 'select_for_update',
+                               side_effect=lambda: lookups.pop() if lookups else select_for_update()):
+            record_analysis('alpha', 'High Impact')
+        
+        active = ActiveStrategy.objects.get(workspace='alpha')
+        self.assertEqual(active.strategy, 'High Impact')
+        self.assertEqual(active.analysis.strategy, 'High Impact')
+    
+    def test_suggest_reads_strategy_without_queries(self):
+        """Once warm, suggest needs no database queries at all."""
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', estimated_hours=1, importance=5)
+        response = self.client.post('/api/tasks/analyze/', {'strategy': 'High Impact', 'tasks': []},
+                                    format='json', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_active_strategy('alpha'), 'High Impact')
+        self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a1')
+    
+    def test_unanalyzed_workspace_is_cached_as_missing(self):
+        self.assertIsNone(get_active_strategy('beta'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_active_strategy('beta'))
+    
+    def test_strategy_change_is_seen_by_other_processes(self):
+        """Two cache clients over one shared store stand in for two worker processes."""
+        from django.core.cache.backends.filebased import FileBasedCache
+        shared_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(shared_dir.cleanup)
+        process_a = FileBasedCache(shared_dir.name, {})
+        process_b = FileBasedCache(shared_dir.name, {})
+        
+        with mock.patch('tasks.cache.cache', process_b):
+            self.assertIsNone(get_active_strategy('w'))
+        with mock.patch('tasks.cache.cache', process_a), self.captureOnCommitCallbacks(execute=True):
+            record_analysis('w', 'High Impact')
+        with mock.patch('tasks.cache.cache', process_b), self.assertNumQueries(0):
+            self.assertEqual(get_active_strategy('w'), 'High Impact')
+    
+    def test_prune_keeps_recent_and_newest_rows(self):
+        for strategy in ['Smart Balance', 'High Impact', 'Fastest Wins', 'Deadline Driven']:
+            record_analysis('alpha', strategy)
+        old = timezone.now() - timedelta(days=120)
+        TaskAnalysis.objects.filter(workspace='alpha').update(last_analyzed_at=old)
+        
+        out = StringIO()
+        call_command('prune_analyses', '--keep', '1', '--dry-run', stdout=out)
+        self.assertIn('Would delete 3', out.getvalue())
+        self.assertEqual(TaskAnalysis.objects.count(), 4)
+        
+        self.assertEqual(prune_history(days=90, keep=1), 3)
+        remaining = TaskAnalysis.objects.get(workspace='alpha')
+        self.assertEqual(remaining.strategy, 'Deadline Driven')
+        self.assertEqual(get_active_strategy('alpha'), 'Deadline Driven')
+
+
+class HorizonRankingTests(ServiceTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.start = date(2026, 3, 1)
+        self.tasks = [
+            {'id': 'soon', 'title': 'Due soon', 'due_date': self.start + timedelta(days=3), 'estimated_hours': 6, 'importance': 4, 'dependencies': []},
+            {'id': 'later', 'title': 'Due later', 'due_date': self.start + timedelta(days=35), 'estimated_hours': 2, 'importance': 6, 'dependencies': []},
+            {'id': 'past', 'title': 'Past due', 'due_date': (self.start - timedelta(days=1)).isoformat(), 'estimated_hours': 3, 'importance': 5, 'dependencies': ['soon']},
+            {'id': 'nodate', 'title': 'No date', 'due_date': None, 'estimated_hours': 1, 'importance': 9, 'dependencies': []},
+            {'id': 'cycle', 'title': 'Cycle', 'due_date': self.start + timedelta(days=10), 'estimated_hours': 4, 'importance': 7, 'dependencies': ['cycle']},
+        ]
+    
+    def test_incremental_days_match_full_rescoring(self):
+        """Every horizon day ranks exactly like compute_scores run on that date."""
+        horizon = rank_horizon(self.tasks, 'Deadline Driven', start=self.start, days=40, top_k=5)
+        
+        self.assertEqual(len(horizon['days']), 40)
+        for entry in horizon['days']:
+            expected = compute_scores(self.tasks, 'Deadline Driven', today=entry['date'])
+            self.assertEqual(
+                [(task['id'], task['score'], task['priority']) for task in entry['top']],
+                [(task['id'], task['score'], task['priority']) for task in expected]
+            )
+    
+    def test_change_dates_report_ranking_and_priority_changes(self):
+        horizon = rank_horizon(self.tasks, 'Deadline Driven', start=self.start, days=40, top_k=2)
+        
+        self.assertFalse(horizon['days'][0]['ranking_changed'])
+        for entry in horizon['days']:
+            changed = entry['ranking_changed'] or bool(entry['priority_changes'])
+            self.assertEqual(entry['date'] in horizon['change_dates'], changed)
+        
+        # Priority changes agree with full rescoring of consecutive days
+        previous = None
+        for entry in horizon['days']:
+            labels = {task['id']: task['priority'] for task in compute_scores(self.tasks, 'Deadline Driven', today=entry['date'])}
+            if previous is not None:
+                expected = [task_id for task_id in labels if labels[task_id] != previous[task_id]]
+                self.assertEqual(sorted(change['id'] for change in entry['priority_changes']), sorted(expected))
+            previous = labels
+        self.assertTrue(any(entry['priority_changes'] for entry in horizon['days']))
+    
+    def test_horizon_endpoint_uses_workspace_tasks(self):
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', due_date=self.start, importance=5)
+        Task.objects.create(workspace='beta', task_id='b1', title='Beta', importance=9)
+        client = APIClient()
+        
+        response = client.get('/api/tasks/horizon/', {'start': '2026-03-01', 'days': 3}, HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 400)
+        
+        response = client.get('/api/tasks/horizon/', {'start': '2026-03-01', 'days': 3, 'strategy': 'High Impact'},
+                              HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['days']), 3)
+        self.assertEqual([task['id'] for task in data['days'][0]['top']], ['a1'])
+
+
+@override_settings(TASK_ADMISSION={
+    'SMALL_LANE_CONCURRENCY': 1,
+    'LARGE_LANE_CONCURRENCY': 1,
+    'SMALL_QUEUE_TIMEOUT': 0,
+    'LARGE_TASK_THRESHOLD': 100,
+    'LARGE_BYTES_THRESHOLD': 10000,
+    'MEMORY_BUDGET_BYTES': 200000,
+})
+class AdmissionControlTests(ServiceTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.payload = {'tasks': [{'id': 't1', 'title': 'Task'}]}
+        reset_controller()
+    
+    def test_requests_are_sized_into_lanes(self):
+        controller = get_controller()
+        self.assertEqual(controller.estimate(10, 2000)[0], 'small')
+        self.assertEqual(controller.estimate(500, 2000)[0], 'large')
+        self.assertEqual(controller.estimate(None, 50000)[0], 'large')
+        self.assertEqual(controller.estimate(10, None)[0], 'large')
+        # Under-declaring the count does not win a small-lane slot for a body that implies many tasks
+        dense = AdmissionController(dict(controller.config, AVERAGE_TASK_BYTES=50))
+        self.assertEqual(dense.estimate(1, 9000)[:2], ('large', 180))
+        self.assertEqual(dense.estimate(None, 4000)[:2], ('small', 80))
+    
+    def test_full_lane_returns_429_with_retry_after(self):
+        """A busy large lane does not block small requests, but a busy small lane rejects fast."""
+        controller = get_controller()
+        with controller.admit(1000, 15000):
+            response = self.client.post('/api/tasks/analyze/', self.payload, format='json')
+            self.assertEqual(response.status_code, 200)
+        
+        with controller.admit(1, 100):
+            response = self.client.post('/api/tasks/analyze/', self.payload, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        
+        metrics = self.client.get('/api/tasks/admission/').json()
+        self.assertEqual(metrics['lanes']['small']['rejected'], 1)
+        self.assertEqual(metrics['lanes']['small']['admitted'], 2)
+        self.assertEqual(metrics['lanes']['small']['active'], 0)
+        self.assertEqual(metrics['memory']['reserved_bytes'], 0)
+    
+    def test_response_is_rendered_under_admission(self):
+        from rest_framework.renderers import JSONRenderer
+        controller = get_controller()
+        reserved = []
+        render = JSONRenderer.render
+        
+        def recording_render(renderer, *args, **kwargs):
+            reserved.append(controller.snapshot()['memory']['reserved_bytes'])
+            return render(renderer, *args, **kwargs)
+        
+        with mock.patch.object(JSONRenderer, 'render', recording_render):
+            response = self.client.post('/api/tasks/analyze/', self.payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tasks'][0]['id'], 't1')
+        # The test client encodes the request body first; the last render is the response
+        self.assertGreater(reserved[-1], 0)
+    
+    def test_memory_budget(self):
+        controller = get_controller()
+        with self.assertRaises(AdmissionRejected) as raised:
+            with controller.admit(10, 50000):
+                pass
+        self.assertEqual(raised.exception.status_code, 413)
+        
+        with controller.admit(1000, 15000):
+            with self.assertRaises(AdmissionRejected) as raised:
+                with controller.admit(1, 9000):
+                    pass
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertIsNotNone(raised.exception.retry_after)
+    
+    def test_declared_task_count_is_enforced(self):
+        payload = {'tasks': [{'id': 't1', 'title': 'Task'}, {'id': 't2', 'title': 'Task'}]}
+        response = self.client.post('/api/tasks/analyze/', payload, format='json', HTTP_X_TASK_COUNT='1')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post('/api/tasks/analyze/', payload, format='json', HTTP_X_TASK_COUNT='lots')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskSnapshotTests(ServiceTestCase):
+    
+    def test_round_trip_preserves_columns_and_dependencies(self):
+        path = os.path.join(self.snapshot_dir, 'roundtrip.snap')
+        rows = [
+            ('a', 'Título A', date(2026, 3, 1), 2.5, 7, ['b', 'external']),
+            ('b', 'Task B', None, None, None, []),
+            ('c', '', date(2026, 1, 1), 0.0, 1, ['a', 'c']),
+        ]
+        self.assertTrue(write_snapshot(path, rows, 1))
+        snapshot = TaskSnapshot(path)
+        
+        self.assertEqual((snapshot.size, snapshot.generation), (3, 1))
+        self.assertEqual(snapshot.task_dicts(), [
+            {'id': 'a', 'title': 'Título A', 'due_date': date(2026, 3, 1), 'estimated_hours': 2.5, 'importance': 7, 'dependencies': ['b', 'external']},
+            {'id': 'b', 'title': 'Task B', 'due_date': None, 'estimated_hours': None, 'importance': None, 'dependencies': []},
+            {'id': 'c', 'title': '', 'due_date': date(2026, 1, 1), 'estimated_hours': 0.0, 'importance': 1, 'dependencies': ['a', 'c']},
+        ])
+        # Unknown dependency ids are kept but are not edges of the CSR graph
+        self.assertEqual(list(snapshot.indptr), [0, 2, 2, 4])
+        self.assertEqual(snapshot.dependency_graph(), build_dependency_graph(snapshot.task_dicts()))
+    
+    def test_older_generation_never_replaces_newer(self):
+        """A slow rebuild from pre-commit rows cannot overwrite the post-commit snapshot."""
+        path = os.path.join(self.snapshot_dir, 'race.snap')
+        self.assertTrue(write_snapshot(path, [('new', 'New', None, None, None, [])], 5))
+        self.assertFalse(write_snapshot(path, [('old', 'Old', None, None, None, [])], 4))
+        self.assertFalse(write_snapshot(path, [('old', 'Old', None, None, None, [])], 5))
+        self.assertFalse(write_snapshot(path, [('old', 'Old', None, None, None, [])], 4, lambda: 5))
+        self.assertEqual(TaskSnapshot(path).task_dict(0)['id'], 'new')
+    
+    def test_files_from_a_previous_database_are_replaced(self):
+        """After a flush or restore the database generation restarts below the file's."""
+        write_snapshot(snapshot_path('alpha'), [('gone', 'Deleted', None, None, None, [])], 5)
+        write_snapshot(snapshot_path('beta'), [('gone', 'Deleted', None, None, None, [])], 5)
+        self.assertEqual([task['id'] for task in get_snapshot('alpha').task_dicts()], ['gone'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(workspace='alpha', task_id='new', title='New')
+        snapshot = get_snapshot('alpha')
+        self.assertEqual(snapshot.generation, 1)
+        self.assertEqual([task['id'] for task in snapshot.task_dicts()], ['new'])
+        
+        # A file for a workspace the database has never seen is removed
+        call_command('build_snapshots', stdout=StringIO())
+        self.assertFalse(os.path.exists(snapshot_path('beta')))
+        self.assertEqual(get_snapshot('beta').task_dicts(), [])
+    
+    def test_writes_swap_in_a_new_generation(self):
+        Task.objects.create(workspace='alpha', task_id='a1', title='First')
+        first = get_snapshot('alpha')
+        self.assertEqual([task['id'] for task in first.task_dicts()], ['a1'])
+        self.assertIs(get_snapshot('alpha'), first)
+        
+        # Until the write commits, readers keep serving the previous file
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(workspace='alpha', task_id='a2', title='Second', dependencies=['a1'])
+            self.assertIs(get_snapshot('alpha'), first)
+        second = get_snapshot('alpha')
+        self.assertEqual(second.generation, first.generation + 1)
+        self.assertEqual([task['id'] for task in second.task_dicts()], ['a1', 'a2'])
+        self.assertEqual(second.dependency_graph()['dependency_counts'], {'a1': 1, 'a2': 0})
+        
+        # The old mapping stays readable for requests that still hold it
+        self.assertEqual(first.task_dict(0)['title'], 'First')
+    
+    def test_writes_in_one_transaction_rebuild_once(self):
+        with mock.patch('tasks.snapshot.write_snapshot', wraps=write_snapshot) as written:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    Task.objects.create(workspace='alpha', task_id=f'a{i}', title='Task')
+        self.assertEqual(written.call_count, 1)
+        self.assertEqual(get_snapshot('alpha').size, 3)
+    
+    @override_settings(TASK_SNAPSHOT_REBUILD_DELAY=0.01)
+    def test_delayed_rebuilds_are_coalesced(self):
+        with mock.patch('tasks.signals.build_snapshot') as build:
+            schedule_rebuild('alpha')
+            schedule_rebuild('alpha')
+            schedule_rebuild('beta')
+            timers = list(signals._scheduled_rebuilds.values())
+            self.assertEqual(len(timers), 2)
+            for timer in timers:
+                timer.join()
+        self.assertEqual(sorted(call.args[0] for call in build.call_args_list), ['alpha', 'beta'])
+        self.assertEqual(signals._scheduled_rebuilds, {})
+    
+    def test_unknown_workspace_is_empty_and_not_persisted(self):
+        response = self.client.get('/api/tasks/', {'workspace': 'nobody'})
+        self.assertEqual(response.json(), {'tasks': []})
+        self.assertFalse(os.path.exists(snapshot_path('nobody')))
+    
+    def test_suggest_and_list_read_from_snapshot(self):
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', estimated_hours=1, importance=5)
+        record_analysis('alpha', 'Smart Balance')
+        build_snapshot('alpha')
+        get_snapshot('alpha')
+        get_active_strategy('alpha')
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['tasks'][0]['title'], 'Alpha')
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a1')
+        
+        # Cached scores are served with one stat of the snapshot and no task decoding
+        with mock.patch('tasks.snapshot.os.stat', wraps=os.stat) as stat, \
+                mock.patch.object(TaskSnapshot, 'task_dict') as task_dict:
+            response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a1')
+        self.assertEqual(stat.call_count, 1)
+        self.assertFalse(task_dict.called)
+    
+    @override_settings(TASK_SNAPSHOT_DIR=None)
+    def test_views_read_the_orm_without_snapshots(self):
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', estimated_hours=1, importance=5)
+        Task.objects.create(workspace='alpha', task_id='a2', title='Beta', dependencies=['a1'])
+        record_analysis('alpha', 'Smart Balance')
+        
+        response = self.client.get('/api/tasks/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(sorted(task['id'] for task in response.json()['tasks']), ['a1', 'a2'])
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a1')
+        response = self.client.get('/api/tasks/horizon/', {'days': 2}, HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.listdir(self.snapshot_dir))
+    
+    def test_dependencies_are_stored_as_strings(self):
+        """Non-string dependency ids are coerced on write and tolerated in rows stored before validation."""
+        response = self.client.post('/api/tasks/', {'id': 'a', 'title': 'A', 'dependencies': [1]},
+                                    format='json', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/tasks/', {'id': 'b', 'title': 'B', 'dependencies': 'abc'},
+                                    format='json', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get(workspace='alpha', task_id='a').dependencies, ['1'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(workspace='alpha', task_id='c', title='C', dependencies=[2, None, 'a'])
+            Task.objects.create(workspace='alpha', task_id='d', title='D', dependencies='abc')
+        os.unlink(snapshot_path('alpha'))
+        record_analysis('alpha', 'Smart Balance')
+        
+        response = self.client.get('/api/tasks/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+        dependencies = {task['id']: task['dependencies'] for task in response.json()['tasks']}
+        self.assertEqual(dependencies, {'a': ['1'], 'c': ['2', 'a'], 'd': []})
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_scores_follow_snapshot_written_by_another_process(self):
+        """Cached scores are keyed on the snapshot generation, not on invalidations this process saw."""
+        Task.objects.create(workspace='alpha', task_id='a1', title='Alpha', importance=5)
+        record_analysis('alpha', 'High Impact')
+        self.assertEqual(self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha').json()['top'][0]['id'], 'a1')
+        
+        # The writer's cache invalidation never reaches this process's cache
+        from django.core.cache.backends.locmem import LocMemCache
+        with mock.patch('tasks.cache.cache', LocMemCache('writer', {})), self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(workspace='alpha', task_id='a2', title='Urgent', importance=10)
+        
+        response = self.client.get('/api/tasks/suggest/', HTTP_X_WORKSPACE='alpha')
+        self.assertEqual(response.json()['top'][0]['id'], 'a2')
@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('tasks/analyze/', views.AnalyzeTasksView.as_view(), name='analyze_tasks'),
     path('tasks/suggest/', views.SuggestTasksView.as_view(), name='suggest_tasks'),
+    path('tasks/horizon/', views.HorizonTasksView.as_view(), name='horizon_tasks'),
+    path('tasks/admission/', views.AdmissionMetricsView.as_view(), name='admission_metrics'),
     path('tasks/', views.TaskCRUDView.as_view(), name='task_crud'),
 ]
@@ -2,19 +2,103 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from .serializers import AnalyzeRequestSerializer, AnalyzeResponseSerializer, SuggestResponseSerializer
-from .scoring import compute_scores
-from .models import Task, TaskAnalysis
+from datetime import date
+import re
+from .serializers import AnalyzeRequestSerializer, AnalyzeResponseSerializer, SuggestResponseSerializer, HorizonRequestSerializer, TaskDependenciesSerializer
+from .scoring import compute_scores, rank_horizon
+from .models import Task, DEFAULT_WORKSPACE
+from .cache import get_cached_scores, get_dependency_graph, store_scores, workspace_generation
+from .history import get_active_strategy, record_analysis
+from .admission import AdmissionRejected, declared_size, get_controller
+from .snapshot import get_snapshot
+
+
+WORKSPACE_HEADER = 'HTTP_X_WORKSPACE'
+WORKSPACE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,50}$')
+
+
+def get_workspace(request):
+    """Resolve the caller's workspace from the X-Workspace header or ?workspace= param."""
+    workspace = request.META.get(WORKSPACE_HEADER) or request.query_params.get('workspace') or DEFAULT_WORKSPACE
+    if not WORKSPACE_PATTERN.match(workspace):
+        return None
+    return workspace
+
+
+def invalid_workspace_response():
+    return Response(
+        {'error': 'Invalid workspace. Use 1-50 letters, digits, "-" or "_".'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def not_analyzed_response():
+    return Response(
+        {'error': 'No tasks analyzed yet. Please analyze tasks first.'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def load_workspace_tasks(workspace):
+    """Return (tasks, dependency graph, generation) for a workspace, from its snapshot when enabled.
+    
+    Snapshot tasks are decoded lazily as they are iterated, so callers that end
+    up serving cached scores never decode them.
+    """
+    snapshot = get_snapshot(workspace)
+    if snapshot is not None:
+        return snapshot, snapshot.dependency_graph(), snapshot.generation
+    
+    generation = workspace_generation(workspace)
+    task_dicts = []
+    for task in Task.objects.filter(workspace=workspace):
+        task_dict = {
+            'id': task.task_id,
+            'title': task.title,
+            'due_date': task.due_date,
+            'estimated_hours': task.estimated_hours,
+            'importance': task.importance,
+            'dependencies': task.dependencies
+        }
+        task_dicts.append(task_dict)
+    return task_dicts, get_dependency_graph(workspace, generation, task_dicts), generation
 
 
 class AnalyzeTasksView(APIView):
     def post(self, request):
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
+        try:
+            task_count, byte_size = declared_size(request)
+        except ValueError:
+            return Response({'error': 'Invalid X-Task-Count or Content-Length header'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Admit before the body is parsed so oversized requests are turned away cheaply
+        try:
+            with get_controller().admit(task_count, byte_size):
+                response = self.analyze(request, workspace, task_count)
+                # Render while the slot and memory reservation are held; encoding the scores is part of the peak
+                return self.finalize_response(request, response).render()
+        except AdmissionRejected as rejection:
+            response = Response({'error': rejection.message}, status=rejection.status_code)
+            if rejection.retry_after is not None:
+                response['Retry-After'] = str(rejection.retry_after)
+            return response
+    
+    def analyze(self, request, workspace, declared_count):
         serializer = AnalyzeRequestSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         strategy = serializer.validated_data['strategy']
         tasks_data = serializer.validated_data['tasks']
+        if declared_count is not None and len(tasks_data) > declared_count:
+            return Response(
+                {'error': f'Request has {len(tasks_data)} tasks but X-Task-Count declared {declared_count}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Convert serialized data to dict format for scoring
         task_dicts = []
@@ -33,7 +117,7 @@ class AnalyzeTasksView(APIView):
         scored_tasks = compute_scores(task_dicts, strategy)
         
         # Store analysis
-        analysis = TaskAnalysis.objects.create(strategy=strategy)
+        record_analysis(workspace, strategy)
         
         response_data = {
             'analyzed_at': timezone.now(),
@@ -46,38 +130,29 @@ class AnalyzeTasksView(APIView):
 
 class SuggestTasksView(APIView):
     def get(self, request):
-        # Get latest analysis
-        latest_analysis = TaskAnalysis.objects.last()
-        if not latest_analysis:
-            return Response(
-                {'error': 'No tasks analyzed yet. Please analyze tasks first.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
+        # Active strategy comes from the cache; the database is only read on a miss
+        strategy = get_active_strategy(workspace)
+        if not strategy:
+            return not_analyzed_response()
         
-        # Get all tasks and compute scores with latest strategy
-        tasks = Task.objects.all()
-        if not tasks:
+        today = date.today()
+        # Cached scores are keyed on the generation of the data they were computed from
+        task_dicts, graph, generation = load_workspace_tasks(workspace)
+        scored_tasks = get_cached_scores(workspace, generation, strategy, today)
+        if scored_tasks is None:
+            # Only this workspace's tasks are scored, against its cached dependency graph
+            scored_tasks = store_scores(workspace, generation, task_dicts, strategy, today, graph=graph)
+        
+        if not scored_tasks:
             return Response(
                 {'error': 'No tasks available. Please add tasks first.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Convert to dict format
-        task_dicts = []
-        for task in tasks:
-            task_dict = {
-                'id': task.task_id,
-                'title': task.title,
-                'due_date': task.due_date,
-                'estimated_hours': task.estimated_hours,
-                'importance': task.importance,
-                'dependencies': task.dependencies
-            }
-            task_dicts.append(task_dict)
-        
-        # Compute scores
-        scored_tasks = compute_scores(task_dicts, latest_analysis.strategy)
-        
         # Get top 3 tasks with suggestions
         top_tasks = []
         for i, task in enumerate(scored_tasks[:3]):
@@ -105,36 +180,73 @@ class SuggestTasksView(APIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class HorizonTasksView(APIView):
+    def get(self, request):
+        """Day-by-day what-if ranking of the workspace's tasks over a date horizon"""
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
+        serializer = HorizonRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        strategy = params.get('strategy') or get_active_strategy(workspace)
+        if not strategy:
+            return not_analyzed_response()
+        
+        task_dicts, graph, _ = load_workspace_tasks(workspace)
+        horizon = rank_horizon(
+            task_dicts, strategy,
+            start=params.get('start'),
+            days=params['days'],
+            top_k=params['top'],
+            graph=graph
+        )
+        return Response(horizon, status=status.HTTP_200_OK)
+
+
+class AdmissionMetricsView(APIView):
+    def get(self, request):
+        """Lane queue depth, wait times and memory reservations for this worker process"""
+        return Response(get_controller().snapshot(), status=status.HTTP_200_OK)
+
+
 class TaskCRUDView(APIView):
     def get(self, request):
-        """Get all tasks"""
-        tasks = Task.objects.all()
-        task_data = []
-        for task in tasks:
-            task_data.append({
-                'id': task.task_id,
-                'title': task.title,
-                'due_date': task.due_date,
-                'estimated_hours': task.estimated_hours,
-                'importance': task.importance,
-                'dependencies': task.dependencies
-            })
-        return Response({'tasks': task_data}, status=status.HTTP_200_OK)
+        """Get all tasks in the caller's workspace"""
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
+        task_dicts, _, _ = load_workspace_tasks(workspace)
+        return Response({'tasks': list(task_dicts)}, status=status.HTTP_200_OK)
     
     def post(self, request):
         """Create or update task"""
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
         task_id = request.data.get('id')
         if not task_id:
             return Response({'error': 'Task ID is required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Dependency ids are stored as strings so every reader can treat them as task ids
+        dependencies = TaskDependenciesSerializer(data=request.data)
+        if not dependencies.is_valid():
+            return Response(dependencies.errors, status=status.HTTP_400_BAD_REQUEST)
+        
         task, created = Task.objects.update_or_create(
+            workspace=workspace,
             task_id=task_id,
             defaults={
                 'title': request.data.get('title', ''),
                 'due_date': request.data.get('due_date'),
                 'estimated_hours': request.data.get('estimated_hours'),
                 'importance': request.data.get('importance'),
-                'dependencies': request.data.get('dependencies', [])
+                'dependencies': dependencies.validated_data['dependencies']
             }
         )
         
@@ -143,12 +255,16 @@ class TaskCRUDView(APIView):
     
     def delete(self, request):
         """Delete task"""
+        workspace = get_workspace(request)
+        if workspace is None:
+            return invalid_workspace_response()
+        
         task_id = request.data.get('id')
         if not task_id:
             return Response({'error': 'Task ID is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            task = Task.objects.get(task_id=task_id)
+            task = Task.objects.get(workspace=workspace, task_id=task_id)
             task.delete()
             return Response({'message': 'Task deleted successfully'}, status=status.HTTP_200_OK)
         except Task.DoesNotExist: